@@ -5,9 +5,11 @@ Zapewnia trwały kontekst i pamięć między działaniami agenta
 import asyncio
 import json
 import logging
+import re
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Deque, Dict, List, Optional, Any
 from dataclasses import dataclass, field
+from collections import deque
 from enum import Enum
 
 # Import TTKi Vision System
@@ -26,6 +28,14 @@ class ActionType(Enum):
     FILE = "file"
     TERMINAL = "terminal"
 
+# Słowa kluczowe dla _determine_action_type (dopasowanie podciągów, kolejność ma znaczenie)
+BROWSER_KEYWORDS = ('http', 'www', 'website', 'browser', 'navigate', 'click button', 'fill form')
+FILE_KEYWORDS = ('file', 'read', 'write', 'create file', 'edit', 'save')
+TERMINAL_KEYWORDS = ('command', 'terminal', 'shell', 'run', 'execute')
+
+# Nazwa folderu w _extract_folder_name - pierwsze słowo po "folder"/"katalog"
+FOLDER_NAME_RE = re.compile(r'(?<!\S)(?:folder|katalog)\s+(\S+)', re.IGNORECASE)
+
 @dataclass
 class AgentState:
     """Trwały stan agenta - pamięta wszystko między akcjami"""
@@ -40,7 +50,7 @@ class AgentState:
     last_detected_elements: List[Dict] = field(default_factory=list)
     vision_enabled: bool = VISION_SYSTEM_AVAILABLE
 
-@dataclass
+@dataclass(slots=True)
 class ActionHistory:
     """Historia pojedynczej akcji"""
     timestamp: datetime
@@ -60,7 +70,8 @@ class TTKiAgent:
     
     def __init__(self):
         self.state = AgentState()
-        self.history: List[ActionHistory] = []
+        # Keep only last 50 actions to prevent memory issues
+        self.history: Deque[ActionHistory] = deque(maxlen=50)
         self.memory: Dict[str, Any] = {}
         
     async def execute_task(self, task: str, context: Optional[Dict] = None) -> Dict[str, Any]:
@@ -68,7 +79,7 @@ class TTKiAgent:
         Główna metoda wykonywania zadań
         Zachowuje kontekst między akcjami jak w Manus
         """
-        logger.info(f"Agent executing task: {task}")
+        logger.info("Agent executing task: %s", task)
         
         # Zachowaj kontekst przed akcją
         context_before = self._capture_context()
@@ -79,20 +90,21 @@ class TTKiAgent:
             self.state.active_context = action_type
             
             # Wykonanie zadania w odpowiednim kontekście
-            if action_type == ActionType.BROWSER:
+            if action_type is ActionType.BROWSER:
                 result = await self._execute_browser_task(task, context)
-            elif action_type == ActionType.DESKTOP:
+            elif action_type is ActionType.DESKTOP:
                 result = await self._execute_desktop_task(task, context)
-            elif action_type == ActionType.FILE:
+            elif action_type is ActionType.FILE:
                 result = await self._execute_file_task(task, context)
-            elif action_type == ActionType.TERMINAL:
+            elif action_type is ActionType.TERMINAL:
                 result = await self._execute_terminal_task(task, context)
             else:
                 raise ValueError(f"Unknown action type: {action_type}")
             
-            # Zachowaj historię
-            context_after = self._capture_context()
-            self._record_action(action_type, task, context or {}, result, True, context_before, context_after)
+            # Zachowaj historię - jeden odczyt zegara dla kontekstu i wpisu historii
+            now = datetime.now()
+            context_after = self._capture_context(now)
+            self._record_action(action_type, task, context or {}, result, True, context_before, context_after, now)
             
             return {
                 "success": True,
@@ -103,8 +115,9 @@ class TTKiAgent:
             
         except Exception as e:
             logger.error(f"Agent task failed: {str(e)}")
-            context_after = self._capture_context()
-            self._record_action(action_type, task, context or {}, str(e), False, context_before, context_after)
+            now = datetime.now()
+            context_after = self._capture_context(now)
+            self._record_action(action_type, task, context or {}, str(e), False, context_before, context_after, now)
             
             return {
                 "success": False,
@@ -117,15 +130,15 @@ class TTKiAgent:
         task_lower = task.lower()
         
         # Browser keywords
-        if any(keyword in task_lower for keyword in ['http', 'www', 'website', 'browser', 'navigate', 'click button', 'fill form']):
+        if any(keyword in task_lower for keyword in BROWSER_KEYWORDS):
             return ActionType.BROWSER
             
         # File operations
-        if any(keyword in task_lower for keyword in ['file', 'read', 'write', 'create file', 'edit', 'save']):
+        if any(keyword in task_lower for keyword in FILE_KEYWORDS):
             return ActionType.FILE
             
         # Terminal operations  
-        if any(keyword in task_lower for keyword in ['command', 'terminal', 'shell', 'run', 'execute']):
+        if any(keyword in task_lower for keyword in TERMINAL_KEYWORDS):
             return ActionType.TERMINAL
             
         # Default to desktop for everything else
@@ -134,7 +147,7 @@ class TTKiAgent:
     async def _execute_desktop_task(self, task: str, context: Optional[Dict]) -> Any:
         """Wykonanie zadania na pulpicie z TTKi Vision System"""
         
-        logger.info(f"🖥️ TTKi Agent: Executing desktop task with vision: {task}")
+        logger.info("🖥️ TTKi Agent: Executing desktop task with vision: %s", task)
         
         # Use TTKi Vision System if available
         if VISION_SYSTEM_AVAILABLE and self.state.vision_enabled:
@@ -157,7 +170,7 @@ class TTKiAgent:
             # Zapisz wykryte elementy w stanie agenta
             self.state.last_detected_elements = ttki_vision.get_elements_as_json()
             
-            logger.info(f"📋 Detected {len(elements_before)} interactive elements")
+            logger.info("📋 Detected %d interactive elements", len(elements_before))
             
             # KROK 2: Heurystyka decyzyjna - znajdź cel
             logger.info("🎯 Phase 2: Finding target element for task...")
@@ -167,7 +180,7 @@ class TTKiAgent:
                 logger.warning("❌ No suitable target element found")
                 return await self._execute_desktop_task_legacy(task, context)
             
-            logger.info(f"🎪 Found target: {target_element.element_type.value} at ({target_element.center_x}, {target_element.center_y})")
+            logger.info("🎪 Found target: %s at (%s, %s)", target_element.element_type.value, target_element.center_x, target_element.center_y)
             
             # KROK 3: Wykonanie akcji
             logger.info("⚡ Phase 3: Executing action on target...")
@@ -217,17 +230,17 @@ class TTKiAgent:
         """Wykonuje akcję na znalezionym elemencie"""
         from app import vnc_shell_exec
         
-        if "create folder" in task.lower() or "utwórz folder" in task.lower():
+        task_lower = task.lower()
+        if "create folder" in task_lower or "utwórz folder" in task_lower:
             # For folder creation, right-click on desktop area
-            logger.info(f"🖱️ Right-clicking at ({target.center_x}, {target.center_y}) for context menu")
+            logger.info("🖱️ Right-clicking at (%s, %s) for context menu", target.center_x, target.center_y)
             
             # Right-click to open context menu
             right_click_cmd = f'DISPLAY=:1 xdotool mousemove {target.center_x} {target.center_y} && xdotool click 3'
             result = vnc_shell_exec(right_click_cmd)
             
             # Wait for context menu to appear
-            import time
-            time.sleep(1)
+            await asyncio.sleep(1)
             
             # Try to click on "Create Folder" or similar option
             # This is simplified - in real implementation we'd detect the menu
@@ -241,7 +254,7 @@ class TTKiAgent:
             }
         else:
             # Standard left-click action
-            logger.info(f"🖱️ Left-clicking at ({target.center_x}, {target.center_y})")
+            logger.info("🖱️ Left-clicking at (%s, %s)", target.center_x, target.center_y)
             
             click_cmd = f'DISPLAY=:1 xdotool mousemove {target.center_x} {target.center_y} && xdotool click 1'
             result = vnc_shell_exec(click_cmd)
@@ -256,7 +269,8 @@ class TTKiAgent:
         logger.info("🔧 Using legacy desktop execution")
         
         # Agent ma własny pointer na pulpicie
-        if "create folder" in task.lower() or "utwórz folder" in task.lower():
+        task_lower = task.lower()
+        if "create folder" in task_lower or "utwórz folder" in task_lower:
             folder_name = self._extract_folder_name(task)
             path = self._extract_path(task) or "/headless/Desktop"
             
@@ -288,11 +302,12 @@ class TTKiAgent:
     
     async def _execute_file_task(self, task: str, context: Optional[Dict]) -> Any:
         """Wykonanie operacji na plikach"""
-        if "read" in task.lower():
+        task_lower = task.lower()
+        if "read" in task_lower:
             filepath = self._extract_filepath(task)
             from app import file_read
             return file_read(filepath)
-        elif "write" in task.lower():
+        elif "write" in task_lower:
             filepath = self._extract_filepath(task)
             content = self._extract_content(task)
             from app import file_write
@@ -309,10 +324,12 @@ class TTKiAgent:
         """Placeholder for browser tasks - to be implemented with Playwright"""
         return "Browser functionality to be implemented with Playwright"
     
-    def _capture_context(self) -> Dict[str, Any]:
+    def _capture_context(self, now: Optional[datetime] = None) -> Dict[str, Any]:
         """Capture current state for history"""
+        if now is None:
+            now = datetime.now()
         return {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "cursor_position": self.state.cursor_position.copy(),
             "active_context": self.state.active_context.value,
             "current_url": self.state.current_url,
@@ -322,10 +339,11 @@ class TTKiAgent:
     
     def _record_action(self, action_type: ActionType, action_name: str, 
                       parameters: Dict, result: Any, success: bool,
-                      context_before: Dict, context_after: Dict):
+                      context_before: Dict, context_after: Dict,
+                      timestamp: Optional[datetime] = None):
         """Record action in history"""
         history_item = ActionHistory(
-            timestamp=datetime.now(),
+            timestamp=timestamp or datetime.now(),
             action_type=action_type,
             action_name=action_name,
             parameters=parameters,
@@ -335,10 +353,6 @@ class TTKiAgent:
             context_after=context_after
         )
         self.history.append(history_item)
-        
-        # Keep only last 50 actions to prevent memory issues
-        if len(self.history) > 50:
-            self.history = self.history[-50:]
     
     def get_memory(self, key: str) -> Any:
         """Retrieve from agent memory"""
@@ -350,7 +364,7 @@ class TTKiAgent:
     
     def get_recent_actions(self, count: int = 5) -> List[ActionHistory]:
         """Get recent actions for context"""
-        return self.history[-count:] if self.history else []
+        return list(self.history)[-count:] if self.history else []
     
     def get_cursor_position(self) -> Dict[str, int]:
         """Get current agent cursor position"""
@@ -363,31 +377,34 @@ class TTKiAgent:
     def get_context_summary(self) -> str:
         """Get summary of current context for LLM"""
         recent_actions = self.get_recent_actions(3)
-        summary = f"Agent context:\n"
-        summary += f"- Cursor position: {self.state.cursor_position}\n"
-        summary += f"- Active context: {self.state.active_context.value}\n"
-        summary += f"- Recent actions:\n"
-        
+        lines = [
+            "Agent context:",
+            f"- Cursor position: {self.state.cursor_position}",
+            f"- Active context: {self.state.active_context.value}",
+            "- Recent actions:",
+        ]
+
         for action in recent_actions:
-            summary += f"  • {action.action_name} ({action.action_type.value}) - {'✓' if action.success else '✗'}\n"
-        
+            lines.append(f"  • {action.action_name} ({action.action_type.value}) - {'✓' if action.success else '✗'}")
+
         if self.memory:
-            summary += f"- Memory: {list(self.memory.keys())}\n"
-        
-        return summary
+            lines.append(f"- Memory: {list(self.memory.keys())}")
+
+        lines.append("")
+        return "\n".join(lines)
     
     # Helper methods for extracting information from tasks
     def _extract_folder_name(self, task: str) -> str:
         """Extract folder name from task"""
-        words = task.split()
-        for i, word in enumerate(words):
-            if word.lower() in ['folder', 'katalog'] and i + 1 < len(words):
-                return words[i + 1]
+        match = FOLDER_NAME_RE.search(task)
+        if match:
+            return match.group(1)
         return "NewFolder"
     
     def _extract_path(self, task: str) -> Optional[str]:
         """Extract path from task"""
-        if "desktop" in task.lower() or "pulpit" in task.lower():
+        task_lower = task.lower()
+        if "desktop" in task_lower or "pulpit" in task_lower:
             return "/headless/Desktop"
         return None
     
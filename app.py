@@ -9,6 +9,7 @@ import os
 import sys
 import json
 import re
+import asyncio
 import subprocess
 import shlex
 import time
@@ -19,6 +20,10 @@ from typing import Dict, List, Tuple, Optional, Any, Callable
 
 from flask import Flask, render_template, make_response
 
+# Przy `python app.py` moduł działa jako __main__ - rejestrujemy go też jako `app`,
+# żeby leniwe `from app import ...` w agent_service nie wykonywało pliku drugi raz
+sys.modules.setdefault("app", sys.modules[__name__])
+
 # Import Agent Service for context management
 try:
     from agent_service import ttki_agent
@@ -37,7 +42,7 @@ def load_text_file(filename: str, fallback: str = "Plik niedostępny") -> str:
     if config_path.exists():
         try:
             return config_path.read_text(encoding="utf-8")
-        except Exception:
+        except (OSError, UnicodeDecodeError):
             pass
     
     # Fallback do root folder (backward compatibility)
@@ -45,7 +50,7 @@ def load_text_file(filename: str, fallback: str = "Plik niedostępny") -> str:
     if root_path.exists():
         try:
             return root_path.read_text(encoding="utf-8")
-        except Exception:
+        except (OSError, UnicodeDecodeError):
             pass
     
     return fallback
@@ -54,14 +59,21 @@ def load_text_file(filename: str, fallback: str = "Plik niedostępny") -> str:
 PROMPT_TEXT = load_text_file("prompt.txt", "# TTKi prompt not found.")
 FUNCTIONS_TEXT = load_text_file("functions.txt", "{}")
 
+# Wzorce do parsowania odpowiedzi modelu - kompilowane raz przy imporcie
+JSON_BLOCK_RE = re.compile(r'```json\s*(.*?)\s*```', re.DOTALL)
+FUNCTION_CALLS_RE = re.compile(r'<function_calls>(.*?)</function_calls>', re.DOTALL)
+TOOL_CODE_RE = re.compile(r'<tool_code>(.*?)</tool_code>', re.DOTALL)
+SHELL_EXEC_CALL_RE = re.compile(r'shell_exec\(\s*command\s*=\s*["\']([^"\']+)["\']')
+SHELL_CALL_RE = re.compile(r'shell\(\s*(?:command\s*=\s*)?["\']([^"\']+)["\']')
+NOTIFY_CALL_RE = re.compile(r'message_notify_user\(\s*(?:text\s*=\s*)?["\']([^"\']+)["\']')
+
 
 def extract_json_objects(text: str) -> List[Dict]:
     """Extract JSON objects from text that may contain markdown and other content."""
     objs: List[Dict] = []
     
     # Szukamy JSON bloków w markdown
-    import re
-    json_blocks = re.findall(r'```json\s*(.*?)\s*```', text, re.DOTALL)
+    json_blocks = JSON_BLOCK_RE.findall(text)
     
     for block in json_blocks:
         # Szukamy obiektów JSON w bloku - każdy może być w osobnej linii
@@ -109,7 +121,6 @@ def ttki_message_notify_user(text: str, attachments: Optional[List[str]] = None)
 def shell_exec(command: str, exec_dir: str = "/tmp") -> str:
     """Execute shell command and return result"""
     try:
-        import os
         original_dir = os.getcwd()
         if exec_dir and os.path.exists(exec_dir):
             os.chdir(exec_dir)
@@ -370,6 +381,12 @@ def safe_configure_gemini() -> Tuple[Any, Optional[str]]:
 
 MODEL, MODEL_ERR = safe_configure_gemini()
 
+# Nazwy finish_reason Gemini dla odpowiedzi zakończonych inaczej niż STOP
+FINISH_REASON_NAMES = {
+    2: "MAX_TOKENS", 3: "SAFETY", 4: "RECITATION",
+    5: "OTHER", 12: "BLOCKED_SAFETY_FILTER"
+}
+
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = os.environ.get("FLASK_SECRET", "dev-secret")
@@ -491,11 +508,7 @@ Example responses for desktop operations:
         
         # Sprawdzenie finish_reason
         if finish_reason and finish_reason != 1:  # 1 = STOP (normal completion)
-            reason_map = {
-                2: "MAX_TOKENS", 3: "SAFETY", 4: "RECITATION", 
-                5: "OTHER", 12: "BLOCKED_SAFETY_FILTER"
-            }
-            reason_name = reason_map.get(finish_reason, f"UNKNOWN({finish_reason})")
+            reason_name = FINISH_REASON_NAMES.get(finish_reason, f"UNKNOWN({finish_reason})")
             print(f"Response blocked: {reason_name}")
             socketio.emit("message", f"Response blocked by Gemini: {reason_name}. Try rephrasing your message.")
             return
@@ -519,8 +532,7 @@ Example responses for desktop operations:
             # NEW: Try JSON inside function_calls tags
             if "<function_calls>" in text and "</function_calls>" in text:
                 print("Parsing function_calls with potential JSON inside")
-                func_calls_pattern = r'<function_calls>(.*?)</function_calls>'
-                func_calls_match = re.search(func_calls_pattern, text, re.DOTALL)
+                func_calls_match = FUNCTION_CALLS_RE.search(text)
                 
                 if func_calls_match:
                     content = func_calls_match.group(1).strip()
@@ -552,7 +564,7 @@ Example responses for desktop operations:
             # Try JSON blocks format
             if "```json" in text:
                 print("Parsing JSON function calls")
-                json_blocks = re.findall(r'```json\s*(.*?)\s*```', text, re.DOTALL)
+                json_blocks = JSON_BLOCK_RE.findall(text)
                 
                 for block in json_blocks:
                     try:
@@ -588,8 +600,7 @@ Example responses for desktop operations:
                 print("Parsing XML function calls")
                 try:
                     # Extract function_calls section
-                    func_calls_pattern = r'<function_calls>(.*?)</function_calls>'
-                    func_calls_match = re.search(func_calls_pattern, text, re.DOTALL)
+                    func_calls_match = FUNCTION_CALLS_RE.search(text)
                     
                     if func_calls_match:
                         xml_content = f"<function_calls>{func_calls_match.group(1)}</function_calls>"
@@ -626,8 +637,7 @@ Example responses for desktop operations:
                 print("Parsing legacy tool_code format")
                 
                 # Extract tool_code content
-                tool_code_pattern = r'<tool_code>(.*?)</tool_code>'
-                matches = re.findall(tool_code_pattern, text, re.DOTALL)
+                matches = TOOL_CODE_RE.findall(text)
                 
                 for code in matches:
                     code = code.strip()
@@ -636,8 +646,7 @@ Example responses for desktop operations:
                     # Parse different function call patterns
                     if 'shell_exec(' in code:
                         # Extract command from shell_exec(command="...")
-                        cmd_pattern = r'shell_exec\(\s*command\s*=\s*["\']([^"\']+)["\']'
-                        cmd_match = re.search(cmd_pattern, code)
+                        cmd_match = SHELL_EXEC_CALL_RE.search(code)
                         if cmd_match:
                             command = cmd_match.group(1)
                             result = shell_exec(command)
@@ -646,8 +655,7 @@ Example responses for desktop operations:
                     
                     if 'shell(' in code:
                         # Handle simple shell(command="...") format
-                        cmd_pattern = r'shell\(\s*(?:command\s*=\s*)?["\']([^"\']+)["\']'
-                        cmd_match = re.search(cmd_pattern, code)
+                        cmd_match = SHELL_CALL_RE.search(code)
                         if cmd_match:
                             command = cmd_match.group(1)
                             result = shell_exec(command)
@@ -656,8 +664,7 @@ Example responses for desktop operations:
                     
                     if 'message_notify_user(' in code:
                         # Extract message from message_notify_user(text="...")
-                        msg_pattern = r'message_notify_user\(\s*(?:text\s*=\s*)?["\']([^"\']+)["\']'
-                        msg_match = re.search(msg_pattern, code)
+                        msg_match = NOTIFY_CALL_RE.search(code)
                         if msg_match:
                             message = msg_match.group(1)
                             socketio.emit("message", f"AI: {message}")
@@ -712,9 +719,6 @@ def agent_execute_task(task: str, context: Optional[Dict] = None) -> Dict[str, A
         }
     
     try:
-        # Use async event loop for agent execution
-        import asyncio
-        
         # Check if there's already an event loop
         try:
             loop = asyncio.get_running_loop()
@@ -815,15 +819,11 @@ def desktop_create_folder_with_context(folder_name: str, path: str = "/headless/
 
 # ============ GLOBAL AGENT INSTANCE ============
 # Global agent instance that persists across function calls
-_global_agent = None
-
 def get_global_agent():
-    """Get or create global agent instance"""
-    global _global_agent
-    if _global_agent is None and AGENT_SERVICE_AVAILABLE:
-        from agent_service import TTKiAgent
-        _global_agent = TTKiAgent()
-    return _global_agent
+    """Get the global agent instance shared with agent_service"""
+    if not AGENT_SERVICE_AVAILABLE:
+        return None
+    return ttki_agent
 
 def agent_execute_task_persistent(task: str, context: Optional[Dict] = None) -> Dict[str, Any]:
     """
@@ -839,9 +839,6 @@ def agent_execute_task_persistent(task: str, context: Optional[Dict] = None) ->
         }
     
     try:
-        # Use async event loop for agent execution
-        import asyncio
-        
         # Check if there's already an event loop
         try:
             loop = asyncio.get_running_loop()
@@ -12,6 +12,7 @@ from dataclasses import dataclass
 from enum import Enum
 import subprocess
 import json
+import time
 from datetime import datetime
 
 # Import dedykowanego Vision AI
@@ -36,7 +37,21 @@ class ElementType(Enum):
     DROPDOWN = "dropdown"
     UNKNOWN = "unknown"
 
-@dataclass
+# Mapowanie typów zwracanych przez Vision AI na ElementType
+ELEMENT_TYPE_MAPPING = {
+    "button": ElementType.BUTTON,
+    "window": ElementType.WINDOW,
+    "menu": ElementType.MENU,
+    "icon": ElementType.ICON,
+    "text_field": ElementType.TEXT_FIELD,
+    "checkbox": ElementType.CHECKBOX,
+    "dropdown": ElementType.DROPDOWN
+}
+
+# Typy elementów reprezentujące obszar pulpitu (heurystyka tworzenia folderu)
+DESKTOP_ELEMENT_TYPES = frozenset({ElementType.WINDOW, ElementType.ICON})
+
+@dataclass(slots=True)
 class InteractiveElement:
     element_type: ElementType
     center_x: int
@@ -56,6 +71,7 @@ class TTKiVisionSystem:
     
     def __init__(self):
         self.last_screenshot = None
+        self.last_screenshot_png = None
         self.last_elements = []
         self.vision_ai = None
         self.ai_enhanced = False
@@ -84,13 +100,16 @@ class TTKiVisionSystem:
                 logger.error(f"Screenshot capture failed: {result.stderr}")
                 return None
             
-            # Load screenshot with OpenCV
-            screenshot = cv2.imread('/tmp/ttki_screenshot.png')
+            # Load screenshot with OpenCV, keeping the PNG bytes scrot already wrote
+            with open('/tmp/ttki_screenshot.png', 'rb') as f:
+                png_bytes = f.read()
+            screenshot = cv2.imdecode(np.frombuffer(png_bytes, np.uint8), cv2.IMREAD_COLOR)
             if screenshot is None:
                 logger.error("Failed to load screenshot")
                 return None
             
             self.last_screenshot = screenshot
+            self.last_screenshot_png = png_bytes
             return screenshot
             
         except Exception as e:
@@ -116,14 +135,20 @@ class TTKiVisionSystem:
         else:
             return self._perceive_with_computer_vision(screenshot, task_context)
     
+    def _screenshot_to_png(self, screenshot: np.ndarray) -> bytes:
+        """PNG bytes for the Vision AI, reusing scrot's file for the last capture"""
+        if screenshot is self.last_screenshot and self.last_screenshot_png is not None:
+            return self.last_screenshot_png
+        _, buffer = cv2.imencode('.png', screenshot)
+        return buffer.tobytes()
+    
     def _perceive_with_ai_vision(self, screenshot: np.ndarray, task_context: str) -> List[InteractiveElement]:
         """Percepcja z dedykowanym AI modelem wizji"""
         try:
             logger.info("🎯 Using dedicated Vision AI for element detection")
             
             # Convert screenshot to bytes
-            _, buffer = cv2.imencode('.png', screenshot)
-            screenshot_bytes = buffer.tobytes()
+            screenshot_bytes = self._screenshot_to_png(screenshot)
             
             # Analyze with dedicated Vision AI
             analysis_result = self.vision_ai.analyze_screenshot_for_elements(
@@ -135,13 +160,15 @@ class TTKiVisionSystem:
             elements = []
             for element_data in analysis_result.elements_detected:
                 coords = element_data.get("coordinates", {})
-                
+                width = coords.get("width", 0)
+                height = coords.get("height", 0)
+
                 element = InteractiveElement(
                     element_type=self._parse_element_type(element_data.get("type", "unknown")),
-                    center_x=coords.get("x", 0) + coords.get("width", 0) // 2,
-                    center_y=coords.get("y", 0) + coords.get("height", 0) // 2,
-                    width=coords.get("width", 0),
-                    height=coords.get("height", 0),
+                    center_x=coords.get("x", 0) + width // 2,
+                    center_y=coords.get("y", 0) + height // 2,
+                    width=width,
+                    height=height,
                     confidence=element_data.get("confidence", 0.0),
                     text_content=element_data.get("text_content"),
                     element_id=element_data.get("element_id"),
@@ -168,14 +195,21 @@ class TTKiVisionSystem:
         # Convert to grayscale for processing
         gray = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
         
+        # Buttons and text fields use the same edge map - find its contours once
+        try:
+            contours = self._find_contours(gray, 50, 150)
+        except Exception as e:
+            logger.warning(f"Contour detection failed: {e}")
+            contours = []
+        
         # Detect potential buttons using contours
-        elements.extend(self._detect_buttons(gray))
+        elements.extend(self._detect_buttons(gray, contours))
         
         # Detect windows/rectangles
         elements.extend(self._detect_windows(gray))
         
         # Detect text fields
-        elements.extend(self._detect_text_fields(gray))
+        elements.extend(self._detect_text_fields(gray, contours))
         
         self.last_elements = elements
         logger.info(f"🔍 Computer vision detected {len(elements)} elements")
@@ -184,27 +218,21 @@ class TTKiVisionSystem:
     
     def _parse_element_type(self, type_str: str) -> ElementType:
         """Convert string to ElementType enum"""
-        type_mapping = {
-            "button": ElementType.BUTTON,
-            "window": ElementType.WINDOW,
-            "menu": ElementType.MENU,
-            "icon": ElementType.ICON,
-            "text_field": ElementType.TEXT_FIELD,
-            "checkbox": ElementType.CHECKBOX,
-            "dropdown": ElementType.DROPDOWN
-        }
-        return type_mapping.get(type_str.lower(), ElementType.UNKNOWN)
+        return ELEMENT_TYPE_MAPPING.get(type_str.lower(), ElementType.UNKNOWN)
+    
+    def _find_contours(self, gray: np.ndarray, low: int, high: int) -> List[np.ndarray]:
+        """Detect edges and return their external contours"""
+        edges = cv2.Canny(gray, low, high)
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return contours
     
-    def _detect_buttons(self, gray: np.ndarray) -> List[InteractiveElement]:
+    def _detect_buttons(self, gray: np.ndarray, contours: Optional[List[np.ndarray]] = None) -> List[InteractiveElement]:
         """Basic button detection using computer vision"""
         elements = []
         
         try:
-            # Detect edges
-            edges = cv2.Canny(gray, 50, 150)
-            
-            # Find contours
-            contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            if contours is None:
+                contours = self._find_contours(gray, 50, 150)
             
             for i, contour in enumerate(contours):
                 x, y, w, h = cv2.boundingRect(contour)
@@ -237,8 +265,7 @@ class TTKiVisionSystem:
         elements = []
         
         try:
-            edges = cv2.Canny(gray, 30, 100)
-            contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            contours = self._find_contours(gray, 30, 100)
             
             for i, contour in enumerate(contours):
                 x, y, w, h = cv2.boundingRect(contour)
@@ -261,14 +288,14 @@ class TTKiVisionSystem:
             
         return elements[:5]
     
-    def _detect_text_fields(self, gray: np.ndarray) -> List[InteractiveElement]:
+    def _detect_text_fields(self, gray: np.ndarray, contours: Optional[List[np.ndarray]] = None) -> List[InteractiveElement]:
         """Basic text field detection"""
         elements = []
         
         try:
             # Simple rectangular detection for text fields
-            edges = cv2.Canny(gray, 50, 150)
-            contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            if contours is None:
+                contours = self._find_contours(gray, 50, 150)
             
             for i, contour in enumerate(contours):
                 x, y, w, h = cv2.boundingRect(contour)
@@ -309,8 +336,7 @@ class TTKiVisionSystem:
         if self.ai_enhanced and self.vision_ai and self.last_screenshot is not None:
             try:
                 # Get AI targeting suggestions
-                _, buffer = cv2.imencode('.png', self.last_screenshot)
-                screenshot_bytes = buffer.tobytes()
+                screenshot_bytes = self._screenshot_to_png(self.last_screenshot)
                 
                 suggestions = self.vision_ai.get_smart_targeting_suggestions(
                     screenshot_bytes, 
@@ -345,10 +371,13 @@ class TTKiVisionSystem:
         if not elements:
             return None
         
-        def distance(element):
-            return ((element.center_x - x) ** 2 + (element.center_y - y) ** 2) ** 0.5
+        # Squared distance orders candidates the same as Euclidean distance
+        def distance_sq(element):
+            dx = element.center_x - x
+            dy = element.center_y - y
+            return dx * dx + dy * dy
         
-        return min(elements, key=distance)
+        return min(elements, key=distance_sq)
     
     def _find_target_with_heuristics(self, task: str, elements: List[InteractiveElement]) -> Optional[InteractiveElement]:
         """Fallback heuristic targeting"""
@@ -359,13 +388,13 @@ class TTKiVisionSystem:
         # Task-specific heuristics
         if "create folder" in task_lower or "utwórz folder" in task_lower:
             # Look for desktop area or file manager
-            desktop_elements = [e for e in elements if e.element_type in [ElementType.WINDOW, ElementType.ICON]]
+            desktop_elements = [e for e in elements if e.element_type in DESKTOP_ELEMENT_TYPES]
             if desktop_elements:
                 return max(desktop_elements, key=lambda e: e.width * e.height)  # Largest area
         
         elif "open" in task_lower or "otwórz" in task_lower:
             # Look for buttons or menu items
-            interactive_elements = [e for e in elements if e.element_type == ElementType.BUTTON]
+            interactive_elements = [e for e in elements if e.element_type is ElementType.BUTTON]
             if interactive_elements:
                 return max(interactive_elements, key=lambda e: e.confidence)
         
@@ -384,7 +413,6 @@ class TTKiVisionSystem:
         logger.info("🔄 Verifying action success...")
         
         # Wait a moment for interface to update
-        import time
         time.sleep(1)
         
         # Capture new screenshot for comparison
@@ -396,11 +424,8 @@ class TTKiVisionSystem:
         if self.ai_enhanced and self.vision_ai and self.last_screenshot is not None:
             try:
                 # Convert both screenshots to bytes
-                _, before_buffer = cv2.imencode('.png', self.last_screenshot)
-                _, after_buffer = cv2.imencode('.png', current_screenshot)
-                
-                before_bytes = before_buffer.tobytes()
-                after_bytes = after_buffer.tobytes()
+                before_bytes = self._screenshot_to_png(self.last_screenshot)
+                after_bytes = self._screenshot_to_png(current_screenshot)
                 
                 # Analyze with dedicated Vision AI
                 verification_result = self.vision_ai.analyze_action_result(
@@ -410,10 +435,12 @@ class TTKiVisionSystem:
                 )
                 
                 if verification_result:
-                    logger.info(f"🎯 AI verification: {verification_result.get('action_successful', False)} (confidence: {verification_result.get('confidence_score', 0):.2f})")
+                    success = verification_result.get("action_successful", False)
+                    confidence = verification_result.get("confidence_score", 0.0)
+                    logger.info(f"🎯 AI verification: {success} (confidence: {confidence:.2f})")
                     return {
-                        "success": verification_result.get("action_successful", False),
-                        "confidence": verification_result.get("confidence_score", 0.0),
+                        "success": success,
+                        "confidence": confidence,
                         "changes_detected": verification_result.get("detected_changes", []),
                         "verification_method": "ai_vision",
                         "analysis": verification_result.get("verification_details", {})
@@ -11,13 +11,13 @@ import base64
 from typing import List, Dict, Optional, Any
 from dataclasses import dataclass
 import google.generativeai as genai
-from datetime import datetime
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True)
 class VisionAnalysisResult:
     """Wynik analizy wizualnej dedykowanego modelu AI"""
     elements_detected: List[Dict]
@@ -76,12 +76,12 @@ class TTKiVisionAI:
         Analiza zrzutu ekranu w poszukiwaniu elementów interaktywnych
         Dedykowany model AI dla maksymalnej responsywności
         """
-        start_time = datetime.now()
-        
         if not self.is_available:
             logger.warning("🔄 TTKi Vision AI not available - using fallback analysis")
             return self._fallback_analysis(screenshot_data, task_context)
-        
+
+        start_time = time.monotonic()
+
         try:
             # Konwertuj screenshot do base64
             screenshot_b64 = base64.b64encode(screenshot_data).decode('utf-8')
@@ -148,7 +148,7 @@ class TTKiVisionAI:
             # Parsuj odpowiedź
             analysis_data = self._parse_vision_response(response.text)
             
-            processing_time = (datetime.now() - start_time).total_seconds()
+            processing_time = time.monotonic() - start_time
             
             return VisionAnalysisResult(
                 elements_detected=analysis_data.get("elements_detected", []),
@@ -281,7 +281,7 @@ class TTKiVisionAI:
             return json.loads(clean_text)
         except json.JSONDecodeError as e:
             logger.error(f"❌ Failed to parse vision response: {e}")
-            logger.debug(f"Raw response: {response_text[:500]}")
+            logger.debug("Raw response: %.500s", response_text)
             return {}
     
     def _extract_confidence_scores(self, analysis_data: Dict) -> Dict[str, float]: